@@ -1,14 +1,62 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from flask import Flask, Response, request, jsonify
+from flask.json.provider import JSONProvider
+import hashlib
+import orjson
+import os
 import re
-import json
+import secrets
+import threading
+from collections import OrderedDict, deque, namedtuple
 from datetime import datetime
-import uuid
+from itertools import cycle, repeat
+
+try:
+    import ahocorasick
+except ImportError:  # fall back to compiled regexes below
+    ahocorasick = None
+
+class OrjsonProvider(JSONProvider):
+    """Route Flask's JSON handling through orjson"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
-# Enable CORS for React integration
-CORS(app, origins="*")
+# Bound request bodies and chat messages so keyword scans stay cheap
+app.config['MAX_CONTENT_LENGTH'] = 64 * 1024
+MAX_MESSAGE_CHARS = 4096
+
+# Enable CORS for React integration. CORS_ORIGINS is a comma-separated
+# allowlist; the default '*' allows any origin.
+CORS_ORIGINS = frozenset(origin.strip() for origin in os.getenv('CORS_ORIGINS', '*').split(','))
+CORS_STATIC_HEADERS = [
+    ('Access-Control-Allow-Methods', 'DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT'),
+]
+if '*' in CORS_ORIGINS:
+    CORS_STATIC_HEADERS.append(('Access-Control-Allow-Origin', '*'))
+
+@app.after_request
+def add_cors_headers(response):
+    """Attach the precomputed CORS headers to every response"""
+    if '*' not in CORS_ORIGINS:
+        response.vary.add('Origin')
+        origin = request.headers.get('Origin')
+        if origin not in CORS_ORIGINS:
+            return response
+        response.headers['Access-Control-Allow-Origin'] = origin
+    response.headers.extend(CORS_STATIC_HEADERS)
+    # Preflights may ask for any request headers, as flask-cors allowed
+    if request.method == 'OPTIONS':
+        response.vary.add('Access-Control-Request-Headers')
+        requested_headers = request.headers.get('Access-Control-Request-Headers')
+        if requested_headers:
+            response.headers['Access-Control-Allow-Headers'] = requested_headers
+    return response
 
 # Crisis keywords that trigger immediate resources
 CRISIS_KEYWORDS = [
@@ -96,92 +144,252 @@ RESPONSES = {
     ]
 }
 
-def detect_crisis(message):
-    """Detect if message contains crisis keywords"""
-    message_lower = message.lower()
-    return any(keyword in message_lower for keyword in CRISIS_KEYWORDS)
+# Intents in the order they are checked; earlier intents win
+INTENT_PRIORITY = tuple(INTENT_PATTERNS)
+_INTENT_BY_RANK = INTENT_PRIORITY + ('default',)
 
-def classify_intent(message):
-    """Simple rule-based intent classification"""
-    message_lower = message.lower()
-    
-    for intent, keywords in INTENT_PATTERNS.items():
-        if any(keyword in message_lower for keyword in keywords):
-            return intent
-    
-    return 'default'
+# Inverted index: each keyword mapped to the highest-priority intent it signals
+KEYWORD_TO_INTENT = {keyword: intent
+                     for intent in reversed(INTENT_PRIORITY)
+                     for keyword in INTENT_PATTERNS[intent]}
 
-def get_response(intent, crisis_detected=False):
-    """Get appropriate response based on intent"""
-    if crisis_detected:
-        return RESPONSES['crisis'][0]
-    
-    if intent in RESPONSES:
-        # For simplicity, return first response. In production, you might rotate or use more sophisticated selection
-        return RESPONSES[intent][0]
-    
-    return RESPONSES['default'][0]
+def _build_keyword_entries():
+    """Map every keyword to (is_crisis_keyword, best intent rank).
 
-def get_resources(intent, crisis_detected=False):
-    """Get relevant resources based on intent and crisis status"""
-    if crisis_detected:
-        return EMERGENCY_RESOURCES
-    
-    if intent in ['resources', 'safety_planning', 'crisis']:
-        return GENERAL_RESOURCES
-    
-    return []
+    Each entry also folds in the keywords that are prefixes of it, since a
+    regex scan only reports the longest keyword starting at a position.
+    """
+    rank_of = {intent: rank for rank, intent in enumerate(INTENT_PRIORITY)}
+    crisis_keywords = frozenset(CRISIS_KEYWORDS)
+    keywords = crisis_keywords | KEYWORD_TO_INTENT.keys()
+    entries = {}
+    for keyword in keywords:
+        prefixes = [k for k in keywords if keyword.startswith(k)]
+        is_crisis = any(k in crisis_keywords for k in prefixes)
+        best_rank = min((rank_of[KEYWORD_TO_INTENT[k]]
+                         for k in prefixes if k in KEYWORD_TO_INTENT),
+                        default=len(INTENT_PRIORITY))
+        entries[keyword] = (is_crisis, best_rank)
+    return entries
+
+KEYWORD_ENTRIES = _build_keyword_entries()
+
+# Messages shorter than this cannot contain any keyword
+MIN_KEYWORD_LEN = min(map(len, KEYWORD_ENTRIES))
+
+def _build_keyword_automaton():
+    """Build one Aho-Corasick automaton over crisis and intent keywords"""
+    automaton = ahocorasick.Automaton()
+    for keyword, entry in KEYWORD_ENTRIES.items():
+        automaton.add_word(keyword, entry)
+    automaton.make_automaton()
+    return automaton
+
+def _trie_pattern(keywords):
+    """Build a regex alternation of keywords that shares common prefixes"""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def render(node):
+        branches = [re.escape(char) + render(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and '' not in node:
+            return branches[0]
+        pattern = '(?:' + '|'.join(branches) + ')'
+        return pattern + '?' if '' in node else pattern
+
+    return render(trie)
+
+def _resolve(entries):
+    """Reduce matched keyword entries to an (intent, crisis_detected) tuple"""
+    crisis_detected = False
+    best_rank = len(INTENT_PRIORITY)
+    for is_crisis, rank in entries:
+        crisis_detected = crisis_detected or is_crisis
+        if rank < best_rank:
+            best_rank = rank
+        if crisis_detected and best_rank == 0:
+            break
+    return _INTENT_BY_RANK[best_rank], crisis_detected
+
+def _analyze_automaton(msg_lower):
+    """Scan the lowered message once with the Aho-Corasick automaton"""
+    return _resolve(entry for _, entry in KEYWORD_AUTOMATON.iter(msg_lower))
+
+def _analyze_regex(msg_lower):
+    """Scan the lowered message once with the combined keyword regex"""
+    return _resolve(map(KEYWORD_ENTRIES.__getitem__,
+                        KEYWORD_RE.findall(msg_lower)))
+
+# analyze(msg_lower) detects crisis keywords and classifies intent together
+# in an already-lowered message, returning an (intent, crisis_detected)
+# tuple. pyahocorasick is preferred; without it the keywords are matched by
+# a C-level regex instead.
+if ahocorasick is not None:
+    KEYWORD_AUTOMATON = _build_keyword_automaton()
+    analyze = _analyze_automaton
+else:
+    # The lookahead lets matches overlap, so keywords inside other matches count
+    KEYWORD_RE = re.compile('(?=(' + _trie_pattern(KEYWORD_ENTRIES) + '))')
+    analyze = _analyze_regex
+
+def analyze_batch(messages):
+    """Analyze many messages, returning an (intent, crisis_detected) tuple for each"""
+    return [analyze(message.strip()[:MAX_MESSAGE_CHARS].lower()) for message in messages]
+
+# Static resource payloads, serialized once at import
+EMERGENCY_JSON = orjson.dumps(EMERGENCY_RESOURCES)
+GENERAL_JSON = orjson.dumps(GENERAL_RESOURCES)
+NO_RESOURCES_JSON = b'[]'
+RESOURCES_ALL_JSON = (b'{"emergency":' + EMERGENCY_JSON +
+                      b',"general":' + GENERAL_JSON + b'}')
+RESOURCES_ETAG = hashlib.md5(RESOURCES_ALL_JSON, usedforsecurity=False).hexdigest()
+
+def _static_json(body, etag, max_age=3600):
+    """Serve a static JSON payload, answering 304 when the client's ETag matches"""
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response
+
+# Rotate through each intent's responses rather than always sending the first.
+# The rotation is shared by every session in the process.
+RESPONSE_CYCLES = {intent: cycle(responses) for intent, responses in RESPONSES.items()}
+
+# A detected crisis always gets the reply that points to 911, never a rotation
+CRISIS_RESPONSE = repeat(RESPONSES['crisis'][0])
+
+def _build_response_table():
+    """Precompute the response rotation and resources for every (intent, crisis) pair"""
+    table = {}
+    for intent in _INTENT_BY_RANK:
+        table[(intent, True)] = (CRISIS_RESPONSE, orjson.Fragment(EMERGENCY_JSON))
+        
+        responses = RESPONSE_CYCLES.get(intent, RESPONSE_CYCLES['default'])
+        if intent in ['resources', 'safety_planning', 'crisis']:
+            table[(intent, False)] = (responses, orjson.Fragment(GENERAL_JSON))
+        else:
+            table[(intent, False)] = (responses, orjson.Fragment(NO_RESOURCES_JSON))
+    return table
+
+# (intent, crisis_detected) -> (response rotation, pre-serialized resources fragment)
+RESPONSE_TABLE = _build_response_table()
+
+# In-memory session storage (use database in production). Sessions are
+# split across shards by hash(session_id), each with its own lock and kept in
+# least-recently-used order, so different sessions rarely share a lock and
+# each shard evicts its own oldest sessions first.
+SESSION_SHARDS = 64
+MAX_SESSIONS = 10_000
+MAX_SESSIONS_PER_SHARD = MAX_SESSIONS // SESSION_SHARDS
+MAX_SESSION_MESSAGES = 200
+_session_shards = [(threading.Lock(), OrderedDict()) for _ in range(SESSION_SHARDS)]
+
+# One stored chat message; intent and crisis_detected are None for user messages
+Msg = namedtuple('Msg', 'role content timestamp intent crisis_detected')
 
-# In-memory session storage (use database in production)
-sessions = {}
+def _session_shard(session_id):
+    """Get the (lock, sessions) shard holding session_id"""
+    return _session_shards[hash(session_id) % SESSION_SHARDS]
+
+def _touch_session(shard, session_id, now):
+    """Get or create a session in a locked shard and mark it most recently used"""
+    session = shard.get(session_id)
+    if session is None:
+        session = shard[session_id] = {
+            'messages': deque(maxlen=MAX_SESSION_MESSAGES),
+            'created_at': now
+        }
+        if len(shard) > MAX_SESSIONS_PER_SHARD:
+            shard.popitem(last=False)
+    else:
+        shard.move_to_end(session_id)
+    return session
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({"error": "Request body is too large"}), 413
+
+def _read_json():
+    """Parse the JSON request body, or return None if it is malformed"""
+    try:
+        return orjson.loads(request.get_data())
+    except orjson.JSONDecodeError:
+        return None
 
 @app.route('/chat', methods=['POST'])
 def chat():
+    if not request.is_json:
+        return jsonify({"error": "Content-Type must be application/json"}), 415
+    data = _read_json()
+    
     try:
-        data = request.get_json()
-        
         if not data or 'message' not in data:
             return jsonify({"error": "Message is required"}), 400
         
-        message = data['message'].strip()
-        session_id = data.get('session_id') or str(uuid.uuid4())
+        message = data['message'].strip()[:MAX_MESSAGE_CHARS]
+        msg_lower = message.lower()
+        session_id = data.get('session_id') or secrets.token_hex(16)
+        now = datetime.now()
+        ts = now.isoformat()
         
-        # Initialize or get session
-        if session_id not in sessions:
-            sessions[session_id] = {
-                'messages': [],
-                'created_at': datetime.now()
-            }
-        
-        # Add user message to session
-        sessions[session_id]['messages'].append({
-            'role': 'user',
-            'content': message,
-            'timestamp': datetime.now().isoformat()
-        })
-        
-        # Analyze message
-        crisis_detected = detect_crisis(message)
-        intent = classify_intent(message)
+        # Analyze message, skipping the scan when no keyword could fit
+        if len(msg_lower) < MIN_KEYWORD_LEN:
+            intent, crisis_detected = 'default', False
+        else:
+            intent, crisis_detected = analyze(msg_lower)
         
         # Generate response
-        response_text = get_response(intent, crisis_detected)
-        resources = get_resources(intent, crisis_detected)
+        responses, resources = RESPONSE_TABLE[(intent, crisis_detected)]
+        response_text = next(responses)
         
-        # Add bot response to session
-        sessions[session_id]['messages'].append({
-            'role': 'bot',
-            'content': response_text,
-            'timestamp': datetime.now().isoformat(),
-            'intent': intent,
-            'crisis_detected': crisis_detected
-        })
+        # Record the turn in the session
+        lock, shard = _session_shard(session_id)
+        with lock:
+            messages = _touch_session(shard, session_id, now)['messages']
+            messages.append(Msg('user', message, ts, None, None))
+            messages.append(Msg('bot', response_text, ts, intent, crisis_detected))
         
-        return jsonify({
+        # resources is an orjson.Fragment, so its cached bytes are embedded as-is
+        return Response(orjson.dumps({
             'response': response_text,
             'resources': resources,
             'crisis_detected': crisis_detected,
             'session_id': session_id
+        }), mimetype='application/json')
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+MAX_BATCH_MESSAGES = 100
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """Classify a batch of messages without recording them in a session"""
+    if not request.is_json:
+        return jsonify({"error": "Content-Type must be application/json"}), 415
+    data = _read_json()
+    
+    try:
+        messages = data.get('messages') if isinstance(data, dict) else None
+        if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+            return jsonify({"error": "messages must be a list of strings"}), 400
+        if len(messages) > MAX_BATCH_MESSAGES:
+            return jsonify({"error": f"At most {MAX_BATCH_MESSAGES} messages per batch"}), 400
+        
+        return jsonify({
+            'results': [{'intent': intent, 'crisis_detected': crisis_detected}
+                        for intent, crisis_detected in analyze_batch(messages)]
         })
         
     except Exception as e:
@@ -190,38 +398,45 @@ def chat():
 @app.route('/resources', methods=['GET'])
 def get_all_resources():
     """Get all available resources"""
-    return jsonify({
-        "emergency": EMERGENCY_RESOURCES,
-        "general": GENERAL_RESOURCES
-    })
+    return _static_json(RESOURCES_ALL_JSON, RESOURCES_ETAG)
 
 @app.route('/session/<session_id>', methods=['DELETE'])
 def delete_session(session_id):
     """Delete session for privacy"""
-    if session_id in sessions:
-        del sessions[session_id]
+    lock, shard = _session_shard(session_id)
+    with lock:
+        deleted = shard.pop(session_id, None) is not None
+    if deleted:
         return jsonify({"message": "Session deleted successfully"})
     return jsonify({"message": "Session not found"}), 404
 
+# Only the timestamp changes, so the rest of the health payload is pre-serialized
+HEALTH_PREFIX = b'{"status":"healthy","timestamp":"'
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({
-        "status": "healthy", 
-        "timestamp": datetime.now().isoformat()
-    })
+    body = HEALTH_PREFIX + datetime.now().isoformat().encode() + b'"}'
+    response = Response(body, mimetype='application/json')
+    response.cache_control.no_cache = True
+    return response
+
+HOME_JSON = orjson.dumps({
+    "message": "Emotional Support Chatbot API",
+    "version": "1.0.0",
+    "endpoints": {
+        "POST /chat": "Send a message to the chatbot",
+        "POST /chat/batch": "Classify a batch of messages",
+        "GET /resources": "Get all available resources",
+        "DELETE /session/<id>": "Delete a chat session",
+        "GET /health": "Health check"
+    }
+})
+HOME_ETAG = hashlib.md5(HOME_JSON, usedforsecurity=False).hexdigest()
 
 @app.route('/', methods=['GET'])
 def home():
-    return jsonify({
-        "message": "Emotional Support Chatbot API",
-        "version": "1.0.0",
-        "endpoints": {
-            "POST /chat": "Send a message to the chatbot",
-            "GET /resources": "Get all available resources",
-            "DELETE /session/<id>": "Delete a chat session",
-            "GET /health": "Health check"
-        }
-    })
+    return _static_json(HOME_JSON, HOME_ETAG)
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Development server only; production runs wsgi:app under gunicorn
+    app.run(debug=os.getenv('FLASK_DEBUG') == '1', host='127.0.0.1', port=5000)
\ No newline at end of file
@@ -0,0 +1,8 @@
+"""Production entry point.
+
+    gunicorn -k gthread --threads 8 -b 0.0.0.0:5000 wsgi:app
+
+Set WEB_CONCURRENCY to run more worker processes. Sessions live in each
+worker's memory, so a session is only visible to the worker that created it.
+"""
+from app import app